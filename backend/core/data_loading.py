@@ -1,39 +1,115 @@
 # core/data_loading.py
 
 import os
-import re
+import tempfile
+from functools import lru_cache
 from pathlib import Path
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 
 RECIPES_DF = Path(os.getenv("RECIPES_DF", "./recipes.csv"))
 
+# Low-cardinality attribute columns stored as categoricals to save memory.
+CATEGORICAL_COLUMNS = ["Cooking_Method", "servings_bin", "cook_time", "CuisineRegion"]
 
-def load_recipes_df() -> pd.DataFrame:
+
+def _recipes_parquet_is_fresh(parquet_path: Path) -> bool:
+    # The Parquet copy is only valid if it was written after the CSV.
+    if not parquet_path.exists():
+        return False
     if not RECIPES_DF.exists():
-        raise RuntimeError(f"Recipes DataFrame not found: {RECIPES_DF}")
-    return pd.read_csv(RECIPES_DF)
+        return True
+    return parquet_path.stat().st_mtime >= RECIPES_DF.stat().st_mtime
+
+
+def _save_recipes_parquet(df: pd.DataFrame, parquet_path: Path) -> None:
+    # Write to a temporary file and move it into place, so a failed or
+    # interrupted write never leaves a truncated Parquet copy behind. The
+    # temporary name is unique, so concurrent writers do not clobber each other.
+    fd, tmp_name = tempfile.mkstemp(dir=parquet_path.parent, suffix=".parquet.tmp")
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    try:
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, parquet_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def _read_recipes_csv() -> pd.DataFrame:
+    # pyarrow parses the CSV with multiple threads, but its type inference
+    # would turn dates into timestamps and fails on rows that do not match the
+    # types guessed from the first block. Read every column as a string, then
+    # convert the columns that are fully numeric, as the default parser does.
+    columns = pd.read_csv(RECIPES_DF, nrows=0).columns
+    table = pa_csv.read_csv(
+        RECIPES_DF,
+        convert_options=pa_csv.ConvertOptions(
+            column_types={col: pa.string() for col in columns},
+            strings_can_be_null=True,
+        ),
+    )
+    df = table.to_pandas()
+    for col in df.columns:
+        numeric = pd.to_numeric(df[col], errors="coerce")
+        if numeric.notna().sum() == df[col].notna().sum():
+            df[col] = numeric
+    return df
+
+
+def load_recipes_df() -> pd.DataFrame:
+    """
+    Load the recipes from a Parquet copy next to RECIPES_DF if it is up to date;
+    otherwise parse the CSV and write the Parquet copy for the next startup.
+    """
+    parquet_path = RECIPES_DF.with_suffix(".parquet")
+    df = None
+    if _recipes_parquet_is_fresh(parquet_path):
+        try:
+            df = pd.read_parquet(parquet_path)
+        except Exception as e:
+            print(f"Error loading recipes cache: {str(e)} => reading {RECIPES_DF}")
+    if df is None:
+        if not RECIPES_DF.exists():
+            raise RuntimeError(f"Recipes DataFrame not found: {RECIPES_DF}")
+        df = _read_recipes_csv()
+        try:
+            _save_recipes_parquet(df, parquet_path)
+        except Exception as e:
+            print(f"Could not cache recipes: {str(e)} => {parquet_path}")
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    # Index by RecipeId for hash lookups, keeping the column for existing users.
+    return df.set_index("RecipeId", drop=False).rename_axis(None)
 
 
 # Load the DataFrame once
 recipes_df = load_recipes_df()
 
 
+@lru_cache(maxsize=1)
 def get_unique_ingredients() -> list:
     """
     Extract unique ingredient strings from the 'BestUsdaIngredientName' column,
     but only split on semicolons. This preserves multi-word USDA names like
     'BLUEBERRIES,RAW' as a single item.
+    recipes_df never changes after startup, so the result is computed once.
     """
-    unique_ings = set()
-    if "BestUsdaIngredientName" in recipes_df.columns:
-        for ing_str in recipes_df["BestUsdaIngredientName"].dropna().unique():
-            # Split only on semicolons
-            parts = re.split(r";", str(ing_str))
-            for part in parts:
-                cleaned = part
-                # Skip empty or known placeholders
-                if cleaned and cleaned != "unknown" and cleaned != "nan":
-                    unique_ings.add(cleaned)
-
-    return sorted(unique_ings)
+    if "BestUsdaIngredientName" not in recipes_df.columns:
+        return []
+
+    # Split only on semicolons, in pandas rather than row by row
+    parts = (
+        recipes_df["BestUsdaIngredientName"]
+        .dropna()
+        .drop_duplicates()
+        .astype(str)
+        .str.split(";")
+        .explode()
+    )
+    # Skip empty or known placeholders
+    parts = parts[~parts.isin(("", "unknown", "nan"))]
+    return sorted(parts.unique().tolist())
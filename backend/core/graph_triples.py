@@ -37,14 +37,35 @@ def map_health_attribute(element: str) -> str:
 
 def split_and_clean(value: str, delimiter: str) -> List[str]:
     """Splits a string by the given delimiter and trims whitespace."""
-    return [v.strip() for v in value.split(delimiter) if v.strip()]
+    parts = (v.strip() for v in value.split(delimiter))
+    return [v for v in parts if v]
 
 
-def load_recipes_from_dataframe(df: pd.DataFrame) -> Dict[Any, Dict[str, Any]]:
+def canonical(node: Tuple[str, Any]) -> str:
     """
-    Extract relevant columns from the DataFrame into a dictionary keyed by RecipeId.
-    Retained columns: RecipeId, Cooking_Method, servings_bin, Diet_Types, meal_type,
+    Convert a node tuple like ("meal_type", "dinner") to the entity label
+    used by PyKEEN, e.g. "meal_type_dinner".
+    """
+    return f"{node[0]}_{node[1]}"
+
+
+def create_graph_and_triples(df: pd.DataFrame) -> Tuple[nx.DiGraph, np.ndarray]:
+    """
+    Build a directed knowledge graph (KG) and extract triples from the recipes
+    DataFrame. Each column is read once into a list and indexed per recipe, so
+    no per-row Series or dict is built.
+    Required columns: RecipeId, Cooking_Method, servings_bin, Diet_Types, meal_type,
                       cook_time, Healthy_Type, CuisineRegion, BestUsdaIngredientName.
+    Recipe nodes: ("recipe", RecipeId); for duplicate RecipeIds the last row wins.
+    Attributes:
+      - Cooking_Method → usesCookingMethod
+      - servings_bin   → hasServingsBin
+      - cook_time      → hasCookTime
+      - CuisineRegion  → hasCuisineRegion
+      - Diet_Types     → hasDietType (list; comma–delimited)
+      - meal_type      → isForMealType (list; comma–delimited)
+      - Healthy_Type   → processed via map_health_attribute
+      - BestUsdaIngredientName → containsIngredient (list; semicolon–delimited)
     """
     columns_to_keep = [
         "RecipeId",
@@ -61,32 +82,17 @@ def load_recipes_from_dataframe(df: pd.DataFrame) -> Dict[Any, Dict[str, Any]]:
     if missing:
         raise ValueError(f"Missing required columns in CSV: {missing}")
 
-    recipes = {}
-    for _, row in df.iterrows():
-        recipe_id = row["RecipeId"]
-        recipe_data = {col: row[col] for col in columns_to_keep}
-        recipes[recipe_id] = recipe_data
-    return recipes
-
+    df = df.drop_duplicates(subset="RecipeId", keep="last")
+    cols = {col: df[col].tolist() for col in columns_to_keep}
 
-def create_graph_and_triples(
-    recipes: Dict[Any, Dict[str, Any]],
-) -> Tuple[nx.DiGraph, np.ndarray]:
-    """
-    Build a directed knowledge graph (KG) and extract triples.
-    Recipe nodes: ("recipe", RecipeId)
-    Attributes:
-      - Cooking_Method → usesCookingMethod
-      - servings_bin   → hasServingsBin
-      - cook_time      → hasCookTime
-      - CuisineRegion  → hasCuisineRegion
-      - Diet_Types     → hasDietType (list; comma–delimited)
-      - meal_type      → isForMealType (list; comma–delimited)
-      - Healthy_Type   → processed via map_health_attribute
-      - BestUsdaIngredientName → containsIngredient (list; semicolon–delimited)
-    """
     G = nx.DiGraph()
     triples = []
+    # Nodes and edges are collected here and inserted into G in bulk at the end.
+    # seen_nodes maps each attribute node to its canonical label, so both the
+    # existence check and the label formatting happen once per distinct node.
+    seen_nodes: Dict[Tuple[str, Any], str] = {}
+    nodes_to_add = []
+    edges_to_add = []
 
     # Single–value attributes.
     attribute_mappings = {
@@ -106,14 +112,15 @@ def create_graph_and_triples(
     ingredient_node_type = "ingredient"
     ingredient_delimiter = ";"  # semicolon–delimited
 
-    for recipe_id, details in recipes.items():
+    for i, recipe_id in enumerate(cols["RecipeId"]):
         # Create the recipe node.
         recipe_node = ("recipe", recipe_id)
-        G.add_node(recipe_node, type="recipe", RecipeId=recipe_id)
+        nodes_to_add.append((recipe_node, {"type": "recipe", "RecipeId": recipe_id}))
+        recipe_label = canonical(recipe_node)
 
         # Process single–value attributes.
         for col, (relation, node_type) in attribute_mappings.items():
-            element = details.get(col, None)
+            element = cols[col][i]
             if (
                 element
                 and element != UNKNOWN_PLACEHOLDER
@@ -121,39 +128,50 @@ def create_graph_and_triples(
             ):
                 element_clean = str(element).strip()  # Preserve original casing!
                 node_id = (node_type, element_clean)
-                if not G.has_node(node_id):
-                    G.add_node(node_id, type=node_type, label=element_clean)
-                G.add_edge(recipe_node, node_id, relation=relation)
-                triples.append((str(recipe_node), relation, str(node_id)))
+                if node_id not in seen_nodes:
+                    seen_nodes[node_id] = canonical(node_id)
+                    nodes_to_add.append(
+                        (node_id, {"type": node_type, "label": element_clean})
+                    )
+                edges_to_add.append((recipe_node, node_id, {"relation": relation}))
+                triples.append((recipe_label, relation, seen_nodes[node_id]))
 
         # Process Healthy_Type.
-        healthy = details.get("Healthy_Type", None)
+        healthy = cols["Healthy_Type"][i]
         if healthy and healthy != UNKNOWN_PLACEHOLDER and str(healthy).strip() != "":
             healthy_elements = split_and_clean(str(healthy), ",")
             for element in healthy_elements:
                 if element:
                     relation = map_health_attribute(element)
                     node_id = ("health_attribute", element)
-                    if not G.has_node(node_id):
-                        G.add_node(node_id, type="health_attribute", label=element)
-                    G.add_edge(recipe_node, node_id, relation=relation)
-                    triples.append((str(recipe_node), relation, str(node_id)))
+                    if node_id not in seen_nodes:
+                        seen_nodes[node_id] = canonical(node_id)
+                        nodes_to_add.append(
+                            (node_id, {"type": "health_attribute", "label": element})
+                        )
+                    edges_to_add.append((recipe_node, node_id, {"relation": relation}))
+                    triples.append((recipe_label, relation, seen_nodes[node_id]))
 
         # Process list–based attributes.
         for col, (relation, node_type, delimiter) in list_attributes.items():
-            value = details.get(col, None)
+            value = cols[col][i]
             if value and value != UNKNOWN_PLACEHOLDER and str(value).strip() != "":
                 elements = split_and_clean(str(value), delimiter)
                 for element in elements:
                     if element:
                         node_id = (node_type, element)
-                        if not G.has_node(node_id):
-                            G.add_node(node_id, type=node_type, label=element)
-                        G.add_edge(recipe_node, node_id, relation=relation)
-                        triples.append((str(recipe_node), relation, str(node_id)))
+                        if node_id not in seen_nodes:
+                            seen_nodes[node_id] = canonical(node_id)
+                            nodes_to_add.append(
+                                (node_id, {"type": node_type, "label": element})
+                            )
+                        edges_to_add.append(
+                            (recipe_node, node_id, {"relation": relation})
+                        )
+                        triples.append((recipe_label, relation, seen_nodes[node_id]))
 
         # Process ingredients.
-        best_usda = details.get("BestUsdaIngredientName", None)
+        best_usda = cols["BestUsdaIngredientName"][i]
         if (
             best_usda
             and best_usda != UNKNOWN_PLACEHOLDER
@@ -166,13 +184,24 @@ def create_graph_and_triples(
                         "ingredient",
                         ingredient.lower(),
                     )  # ingredients stored in lower-case
-                    if not G.has_node(node_id):
-                        G.add_node(node_id, type=ingredient_node_type, label=ingredient)
-                    G.add_edge(recipe_node, node_id, relation=ingredient_relation)
+                    if node_id not in seen_nodes:
+                        seen_nodes[node_id] = canonical(node_id)
+                        nodes_to_add.append(
+                            (
+                                node_id,
+                                {"type": ingredient_node_type, "label": ingredient},
+                            )
+                        )
+                    edges_to_add.append(
+                        (recipe_node, node_id, {"relation": ingredient_relation})
+                    )
                     triples.append(
-                        (str(recipe_node), ingredient_relation, str(node_id))
+                        (recipe_label, ingredient_relation, seen_nodes[node_id])
                     )
 
+    G.add_nodes_from(nodes_to_add)
+    G.add_edges_from(edges_to_add)
+
     triples_array = np.array(triples, dtype=str)
     return G, triples_array
 
@@ -1,21 +1,70 @@
 import ast
 import os
+import shutil
+import tempfile
 from pathlib import Path
+from threading import Lock
+from typing import Tuple
 
 import numpy as np
-import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 import torch
 from pykeen.models import Model
 from pykeen.triples import TriplesFactory
 
 MODEL_PATH = Path(os.getenv("MODEL_PATH", "./model.pkl"))
 TRIPLES_PATH = Path(os.getenv("TRIPLES_PATH", "./triples.csv"))
+TRIPLES_FACTORY_DIR = Path(os.getenv("TRIPLES_FACTORY_DIR", "./triples_factory"))
+# "auto" uses CUDA when available and falls back to CPU.
+DEVICE = os.getenv("DEVICE", "auto")
+# Set to "float16" or "bfloat16" to score with reduced-precision embeddings.
+MODEL_DTYPES = {
+    "float32": torch.float32,
+    "float16": torch.float16,
+    "bfloat16": torch.bfloat16,
+}
+_model_dtype_name = os.getenv("MODEL_DTYPE", "float32")
+if _model_dtype_name not in MODEL_DTYPES:
+    raise RuntimeError(
+        f"Invalid MODEL_DTYPE: {_model_dtype_name} "
+        f"(expected one of {', '.join(MODEL_DTYPES)})"
+    )
+MODEL_DTYPE = MODEL_DTYPES[_model_dtype_name]
+
+
+def _resolve_device(name: str) -> torch.device:
+    """
+    Resolve a DEVICE setting ("auto", "cpu", "cuda" or "cuda:N") to a device,
+    raising if it is malformed or names a CUDA device that does not exist.
+    torch.cuda.device_count() asks NVML rather than initialising CUDA, so this
+    is safe to run in the gunicorn master before the workers are forked.
+    """
+    cuda_count = torch.cuda.device_count()
+    if name == "auto":
+        return torch.device("cuda" if cuda_count > 0 else "cpu")
+    try:
+        device = torch.device(name)
+    except RuntimeError:
+        device = None
+    if device is None or device.type not in ("cpu", "cuda"):
+        raise RuntimeError(
+            f"Invalid DEVICE: {name} (expected one of auto, cpu, cuda, cuda:N)"
+        )
+    if device.type == "cuda" and (device.index or 0) >= cuda_count:
+        raise RuntimeError(
+            f"DEVICE {name} is not available ({cuda_count} CUDA devices found)"
+        )
+    return device
+
+
+_device = _resolve_device(DEVICE)
 
 
 def tuple_to_canonical(s: str) -> str:
     """
     Convert a string like "('meal_type', 'dinner')" to "meal_type_dinner".
-    Used when loading the CSV of triples.
+    Only needed for triples files written before labels were saved canonically.
     """
     try:
         t = ast.literal_eval(s)  # e.g. ("meal_type", "dinner")
@@ -37,25 +86,139 @@ def load_kge_model() -> Model:
     )
 
 
-def get_triples_factory():
+def _triples_factory_cache_is_fresh() -> bool:
+    # The cache is only valid if it was written after the triples CSV.
+    if not TRIPLES_FACTORY_DIR.exists():
+        return False
+    if not TRIPLES_PATH.exists():
+        return True
+    return TRIPLES_FACTORY_DIR.stat().st_mtime >= TRIPLES_PATH.stat().st_mtime
+
+
+def get_triples_factory() -> TriplesFactory:
+    """
+    Load the triples factory from its binary cache if available; otherwise
+    build it from the triples CSV and write the cache for the next startup.
+    """
+    if _triples_factory_cache_is_fresh():
+        try:
+            return TriplesFactory.from_path_binary(TRIPLES_FACTORY_DIR)
+        except Exception as e:
+            print(f"Error loading triples factory cache: {str(e)} => rebuilding")
+
+    triples_factory = _build_triples_factory()
+    try:
+        _save_triples_factory_cache(triples_factory)
+    except OSError as e:
+        print(f"Could not cache triples factory: {str(e)} => {TRIPLES_FACTORY_DIR}")
+    return triples_factory
+
+
+def _save_triples_factory_cache(triples_factory: TriplesFactory) -> None:
+    # Write into a temporary directory next to the target and move it into
+    # place, so a failed or interrupted write never leaves a partial cache.
+    tmp_dir = Path(
+        tempfile.mkdtemp(
+            prefix=f".{TRIPLES_FACTORY_DIR.name}-", dir=TRIPLES_FACTORY_DIR.parent
+        )
+    )
+    try:
+        triples_factory.to_path_binary(tmp_dir)
+        if TRIPLES_FACTORY_DIR.exists():
+            shutil.rmtree(TRIPLES_FACTORY_DIR)
+        os.replace(tmp_dir, TRIPLES_FACTORY_DIR)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _build_triples_factory() -> TriplesFactory:
     if not TRIPLES_PATH.exists():
         raise RuntimeError(f"Triples file not found: {TRIPLES_PATH}")
-    df = pd.read_csv(TRIPLES_PATH)
+    # Read the labels as plain strings, so pyarrow does not infer other types.
+    columns = ["Head", "Relation", "Tail"]
+    table = pa_csv.read_csv(
+        TRIPLES_PATH,
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=columns,
+            column_types={col: pa.string() for col in columns},
+        ),
+    )
+    triples = table.to_pandas()
+    triples["Relation"] = triples["Relation"].str.strip()
 
-    # Convert each Head, Relation, Tail string to canonical form
-    # so that PyKEEN sees them as consistent strings
-    triples = []
-    for h, r, t in df[["Head", "Relation", "Tail"]].values:
-        ch = tuple_to_canonical(h)
-        cr = r.strip()
-        ct = tuple_to_canonical(t)
-        triples.append((ch, cr, ct))
+    # Older triples files stored heads/tails as tuple strings such as
+    # "('meal_type', 'dinner')"; convert those to canonical form so that
+    # PyKEEN sees consistent labels. Current files are already canonical.
+    if triples["Head"].str.startswith("(").any():
+        for col in ("Head", "Tail"):
+            triples[col] = triples[col].map(tuple_to_canonical)
 
     return TriplesFactory.from_labeled_triples(
-        triples=np.array(triples, dtype=str), create_inverse_triples=False
+        triples=triples.to_numpy(dtype=str), create_inverse_triples=False
     )
 
 
+def get_device() -> torch.device:
+    return _device
+
+
+_model_lock = Lock()
+
+
+def _prepare_model(device: torch.device) -> None:
+    model.to(device)
+    # Only real-valued parameters are cast; casting complex embeddings (e.g.
+    # RotatE, ComplEx) to a real dtype would drop their imaginary part.
+    for param in model.parameters():
+        if param.is_floating_point():
+            param.data = param.data.to(MODEL_DTYPE)
+
+
+def get_model() -> Model:
+    """
+    Return the KGE model on get_device() with MODEL_DTYPE parameters,
+    preparing it on first use.
+    The model is loaded on CPU at import time. A CPU model is also cast there,
+    but a CUDA model is only moved and cast here, inside the serving process:
+    CUDA cannot be used in a worker forked from a master that has already
+    initialised it, which gunicorn's preload_app would otherwise do.
+    """
+    global _model_prepared
+    with _model_lock:
+        if not _model_prepared:
+            _prepare_model(get_device())
+            _model_prepared = True
+    return model
+
+
+def _get_recipe_entities(
+    triples_factory: TriplesFactory,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the entity ids of all recipe entities in ascending order, together
+    with the RecipeId part of their labels ("recipe_<RecipeId>").
+    """
+    recipes = sorted(
+        (entity_id, label.split("recipe_", 1)[1])
+        for label, entity_id in triples_factory.entity_to_id.items()
+        if label.startswith("recipe_")
+    )
+    entity_ids = np.array([entity_id for entity_id, _ in recipes], dtype=np.int64)
+    ids = np.array([recipe_id for _, recipe_id in recipes], dtype=object)
+    return entity_ids, ids
+
+
 # Load model and triples factory exactly once:
 model = load_kge_model().eval()
 triples_factory = get_triples_factory()
+
+# On CPU, prepare the model here, in the preloaded gunicorn master, so the
+# workers share the cast parameters copy-on-write instead of each casting (and
+# holding) a private copy after the fork.
+_model_prepared = _device.type == "cpu"
+if _model_prepared:
+    _prepare_model(_device)
+
+# Recipe entities never change, so find them once instead of filtering labels
+# by prefix on every request. recipe_ids holds the RecipeId part of each label.
+recipe_entity_ids, recipe_ids = _get_recipe_entities(triples_factory)
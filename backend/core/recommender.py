@@ -1,12 +1,46 @@
+from threading import Lock
 from typing import Any, Dict, List, Tuple
 
+import numpy as np
 import pandas as pd
-from pykeen.predict import predict_target
-from sklearn.preprocessing import MinMaxScaler
+import torch
 
 from .data_loading import recipes_df
 from .graph_triples import map_health_attribute
-from .model import model, triples_factory
+from .model import get_device, get_model, recipe_entity_ids, recipe_ids, triples_factory
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; fall back to NumPy
+    njit = None
+
+# Node types a user can select on, as used in the entity labels "<type>_<value>".
+_CRITERION_NODE_TYPES = (
+    "cooking_method",
+    "servings_bin",
+    "diet_type",
+    "meal_type",
+    "cook_time",
+    "health_attribute",
+    "cuisine_region",
+    "ingredient",
+)
+
+
+def _build_tail_index() -> Dict[Tuple[str, str], int]:
+    """Map (node_type, value) to the entity id of the label "<node_type>_<value>"."""
+    index = {}
+    for label, entity_id in triples_factory.entity_to_id.items():
+        for node_type in _CRITERION_NODE_TYPES:
+            if label.startswith(node_type + "_"):
+                index[(node_type, label[len(node_type) + 1 :])] = entity_id
+                break
+    return index
+
+
+# Built once, so criteria are resolved to integer ids without formatting labels.
+_tail_ids = _build_tail_index()
+_relation_ids = triples_factory.relation_to_id
 
 
 def map_user_input_to_criteria(
@@ -19,112 +53,166 @@ def map_user_input_to_criteria(
     cuisine_region: str | None,
     ingredients: List[str],
     weights: Dict[str, float],
-) -> List[Tuple[str, str, float]]:
+) -> List[Tuple[int, int, float]]:
     """
-    Convert user input into a list of (tail_entity, relation, weight) triples for prediction.
+    Convert user input into a list of (tail_id, relation_id, weight) triples for prediction.
     For free–text inputs (like cooking_method) we lower–case; for select inputs we use the value as is.
     """
     criteria = []
 
     if cooking_method:
         cm = cooking_method.strip().lower()  # free–text input
-        tail = f"cooking_method_{cm}"
-        criteria.append((tail, "usesCookingMethod", weights.get("cooking_method", 1.0)))
+        tail = _tail_ids[("cooking_method", cm)]
+        relation = _relation_ids["usesCookingMethod"]
+        criteria.append((tail, relation, weights.get("cooking_method", 1.0)))
 
     if servings_bin:
         sb = servings_bin.strip()  # from a select; use as is
-        tail = f"servings_bin_{sb}"
-        criteria.append((tail, "hasServingsBin", weights.get("servings_bin", 1.0)))
+        tail = _tail_ids[("servings_bin", sb)]
+        relation = _relation_ids["hasServingsBin"]
+        criteria.append((tail, relation, weights.get("servings_bin", 1.0)))
 
     for dt in diet_types:
         dt_clean = dt.strip()  # use as is (e.g. "Standard")
-        tail = f"diet_type_{dt_clean}"
-        criteria.append((tail, "hasDietType", weights.get("diet_types", 1.0)))
+        tail = _tail_ids[("diet_type", dt_clean)]
+        relation = _relation_ids["hasDietType"]
+        criteria.append((tail, relation, weights.get("diet_types", 1.0)))
 
     for mt in meal_type:
         mt_clean = mt.strip()  # use as is (e.g. "dessert")
-        tail = f"meal_type_{mt_clean}"
-        criteria.append((tail, "isForMealType", weights.get("meal_type", 1.0)))
+        tail = _tail_ids[("meal_type", mt_clean)]
+        relation = _relation_ids["isForMealType"]
+        criteria.append((tail, relation, weights.get("meal_type", 1.0)))
 
     if cook_time:
         ct = cook_time.strip()  # use as is (e.g. "less than 60 Mins")
-        tail = f"cook_time_{ct}"
-        criteria.append((tail, "hasCookTime", weights.get("cook_time", 1.0)))
+        tail = _tail_ids[("cook_time", ct)]
+        relation = _relation_ids["hasCookTime"]
+        criteria.append((tail, relation, weights.get("cook_time", 1.0)))
 
     for ht in health_types:
         ht_clean = ht.strip()  # these come from separate selects; use as is
-        relation = map_health_attribute(ht_clean)
-        tail = f"health_attribute_{ht_clean}"
+        relation = _relation_ids[map_health_attribute(ht_clean)]
+        tail = _tail_ids[("health_attribute", ht_clean)]
         criteria.append((tail, relation, weights.get("healthy_type", 1.0)))
 
     if cuisine_region:
         cr = cuisine_region.strip()  # free–text input; use as is
-        tail = f"cuisine_region_{cr}"
-        criteria.append((tail, "hasCuisineRegion", weights.get("cuisine_region", 1.0)))
+        tail = _tail_ids[("cuisine_region", cr)]
+        relation = _relation_ids["hasCuisineRegion"]
+        criteria.append((tail, relation, weights.get("cuisine_region", 1.0)))
 
     for ing in ingredients:
         ing_clean = ing.strip()  # ingredients from backend are already lower-case
-        tail = f"ingredient_{ing_clean}"
-        criteria.append((tail, "containsIngredient", weights.get("ingredients", 1.0)))
+        tail = _tail_ids[("ingredient", ing_clean)]
+        relation = _relation_ids["containsIngredient"]
+        criteria.append((tail, relation, weights.get("ingredients", 1.0)))
 
     return criteria
 
 
-def _normalize_scores(df: pd.DataFrame) -> pd.DataFrame:
-    if df.empty:
-        df["normalized_score"] = 0.0
-        return df
-    scaler = MinMaxScaler()
-    df["normalized_score"] = scaler.fit_transform(df[["score"]])
-    return df
+def _normalize_scores(scores: np.ndarray) -> np.ndarray:
+    """Min-max normalize each row of a (criteria, entities) score matrix."""
+    if scores.size == 0:
+        return scores
+    lo = scores.min(axis=1, keepdims=True)
+    span = scores.max(axis=1, keepdims=True) - lo
+    # Constant rows normalize to 0 rather than dividing by zero.
+    span[span == 0] = 1
+    return ((scores - lo) / span).astype(np.float32, copy=False)
+
+
+_SCORE_CACHE_SIZE = 128
+_score_cache: Dict[Tuple[int, int], np.ndarray] = {}
+_score_cache_lock = Lock()
+
+
+def _predict(pairs: List[Tuple[int, int]]) -> np.ndarray:
+    """
+    Predict normalized head scores for each (tail_id, relation_id) pair.
+    Scores are normalized over all entities, but only recipe entities can be
+    recommended, so the result has shape (len(pairs), len(recipe_entity_ids))
+    with columns in recipe_entity_ids order.
+    Pairs not seen before are scored together in one forward pass; the model
+    and triples factory never change after startup, so results are cached per
+    pair (oldest first out). Each cached row is its own compact array, so
+    evicting an entry frees its memory.
+    """
+    with _score_cache_lock:
+        rows = {pair: _score_cache.get(pair) for pair in pairs}
+    missing = [pair for pair, row in rows.items() if row is None]
+
+    if missing:
+        rt_batch = torch.as_tensor(
+            [[relation_id, tail_id] for tail_id, relation_id in missing],
+            dtype=torch.long,
+            device=get_device(),
+        )
+        with torch.inference_mode():
+            scores = get_model().predict_h(rt_batch).float().cpu().numpy()
+        normalized = _normalize_scores(scores)
+        # Indexing each row separately copies it, rather than keeping a view
+        # that would pin the whole batch matrix in the cache.
+        recipe_rows = [row[recipe_entity_ids] for row in normalized]
+        rows.update(zip(missing, recipe_rows))
+
+        with _score_cache_lock:
+            for pair, row in zip(missing, recipe_rows):
+                if len(_score_cache) >= _SCORE_CACHE_SIZE:
+                    _score_cache.pop(next(iter(_score_cache)))
+                _score_cache[pair] = row
+
+    return np.stack([rows[pair] for pair in pairs])
+
+
+if njit is not None:
+
+    # Serial on purpose: K x recipes is small, and parallel kernels are not safe
+    # to call from FastAPI's thread pool under every Numba threading layer. The
+    # explicit signature compiles the kernel at import, i.e. once in the
+    # preloaded gunicorn master rather than on the first request per worker.
+    @njit("float32[::1](float32[:, ::1], float32[::1])", fastmath=True)
+    def _weighted_sum(scores: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Sum weights[k] * scores[k, j] over k for each column j."""
+        total = np.empty(scores.shape[1], dtype=np.float32)
+        for j in range(scores.shape[1]):
+            acc = np.float32(0.0)
+            for k in range(weights.size):
+                acc += weights[k] * scores[k, j]
+            total[j] = acc
+        return total
+
+else:
+
+    def _weighted_sum(scores: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Sum weights[k] * scores[k, j] over k for each column j."""
+        return weights @ scores
 
 
 def get_matching_recipes(
-    criteria: List[Tuple[str, str, float]], top_k: int, flexible: bool
+    criteria: List[Tuple[int, int, float]], top_k: int, flexible: bool
 ) -> List[str]:
     """
-    For each (tail, relation, weight) criterion, predict head nodes using PyKEEN,
-    merge results (union if flexible, intersection if not), and return the top_k recipe IDs.
+    For each (tail_id, relation_id, weight) criterion, predict head nodes using PyKEEN,
+    sum the weighted scores per recipe and return the top_k recipe IDs.
+    Every criterion scores every entity, so the union (flexible) and the
+    intersection (not flexible) of predicted heads are the same set and both
+    modes reduce to the same weighted sum.
     """
     if not criteria:
         return []
 
-    all_preds = []
-    for tail, relation, weight in criteria:
-        preds = predict_target(
-            model=model, relation=relation, tail=tail, triples_factory=triples_factory
-        ).df
-        preds = _normalize_scores(preds)
-        preds["weighted_score"] = preds["normalized_score"] * weight
-        preds = preds[["head_label", "weighted_score"]]
-        all_preds.append(preds)
-
-    merged = all_preds[0]
-    for other in all_preds[1:]:
-        if flexible:
-            merged = merged.merge(
-                other, on="head_label", how="outer", suffixes=("", "_y")
-            )
-            merged["weighted_score"] = merged["weighted_score"].fillna(0) + merged[
-                "weighted_score_y"
-            ].fillna(0)
-            merged.drop(columns=["weighted_score_y"], inplace=True)
-        else:
-            merged = merged.merge(
-                other, on="head_label", how="inner", suffixes=("", "_y")
-            )
-            merged["weighted_score"] += merged["weighted_score_y"]
-            merged.drop(columns=["weighted_score_y"], inplace=True)
-
-    merged = merged[merged["head_label"].str.startswith("recipe_")]
-    merged.sort_values(by="weighted_score", ascending=False, inplace=True)
-    merged = merged.head(top_k)
-
-    def parse_recipe_id(node_str: str) -> str:
-        return node_str.split("recipe_", 1)[1]
-
-    ids = merged["head_label"].apply(parse_recipe_id).to_list()
-    return ids
+    scores = _predict([(tail, relation) for tail, relation, _ in criteria])
+    weights = np.array([weight for _, _, weight in criteria], dtype=np.float32)
+    total = _weighted_sum(scores, weights)
+
+    top_k = min(top_k, total.size)
+    if top_k <= 0:
+        return []
+    # Select the top_k in linear time, then sort only those.
+    top = np.argpartition(-total, top_k - 1)[:top_k]
+    top = top[np.argsort(-total[top])]
+    return recipe_ids[top].tolist()
 
 
 def fetch_recipe_info(recipe_id: str) -> Dict[str, Any] | None:
@@ -136,7 +224,12 @@ def fetch_recipe_info(recipe_id: str) -> Dict[str, Any] | None:
     except ValueError:
         return None
 
-    row = recipes_df[recipes_df["RecipeId"] == rid_int]
-    if row.empty:
+    try:
+        row = recipes_df.loc[rid_int]
+    except KeyError:
         return None
-    return row.iloc[0].to_dict()
+    if isinstance(row, pd.DataFrame):
+        # Duplicate RecipeIds: return the first match, as before.
+        row = row.iloc[0]
+    # Missing values become None, since NaN is not valid JSON.
+    return row.where(row.notna(), None).to_dict()
@@ -0,0 +1,16 @@
+# gunicorn.conf.py
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = "0.0.0.0:8000"
+workers = int(os.getenv("WORKER_COUNT", 1))
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Import the app (and with it the KGE model, triples factory and recipes) once
+# in the master before forking, so workers share those pages copy-on-write
+# instead of each loading its own copy.
+preload_app = True
@@ -3,6 +3,7 @@ import os
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from routers import recipe_info, recommend, unique_items
 
 load_dotenv()
@@ -12,6 +13,7 @@ WORKER_COUNT = int(os.getenv("WORKER_COUNT", 1))
 app = FastAPI(
     title="Food Recommendation API",
     version="1.0",
+    default_response_class=ORJSONResponse,
 )
 
 app.add_middleware(